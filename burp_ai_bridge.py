@@ -10,18 +10,95 @@
 # 2. Burp Suite -> Extender -> Options -> Python Environment -> Select Jython JAR
 # 3. Burp Suite -> Extender -> Extensions -> Add -> Extension Type: Python -> Select this file
 
-from burp import IBurpExtender, IHttpListener, IProxyListener
-from java.io import PrintWriter
-from java.net import ServerSocket, InetAddress
-from java.lang import Thread, Runnable
+from burp import IBurpExtender, IHttpListener, IProxyListener, IExtensionStateListener
+from java.io import PrintWriter, BufferedInputStream, BufferedOutputStream, ByteArrayOutputStream
+from java.net import ServerSocket, InetAddress, SocketTimeoutException
+from java.lang import Thread, Runnable, Runtime
+from java.util import Base64
+from java.util.concurrent import Executors
+from java.util.zip import GZIPOutputStream
+from jarray import zeros
 import json
-import base64
 import re
+import threading
+from collections import deque
 
 VERSION = "1.0.0"
 AUTHOR = "Can Hieu"
 
-class BurpExtender(IBurpExtender, IProxyListener):
+# JVM encoder; takes the Java byte[] from Burp directly, no Python-side copy
+_ENC = Base64.getEncoder()
+
+# Searched for in captured requests to flag file uploads
+_UPLOAD_MARKER = "multipart/form-data"
+
+# Largest request header block (and request body) the API will buffer
+_MAX_REQUEST_BYTES = 32 * 1024
+
+# Bodies smaller than this are sent uncompressed even if the client accepts gzip
+_GZIP_MIN_BYTES = 1024
+
+# Response header template (status, extra headers, content length, connection),
+# CORS included
+_RESPONSE_HEADER = (
+    "HTTP/1.1 %s\r\n"
+    "Access-Control-Allow-Origin: *\r\n"
+    "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+    "Access-Control-Allow-Headers: Content-Type\r\n"
+    "Content-Type: application/json\r\n"
+    "%s"
+    "Content-Length: %d\r\n"
+    "Connection: %s\r\n"
+    "\r\n"
+)
+
+
+def _dumps(obj):
+    """Serialize obj to compact JSON bytes"""
+    body = json.dumps(obj, separators=(',', ':'))
+    # Python 2 / Jython already returns an ASCII byte string here
+    return body if isinstance(body, bytes) else body.encode('utf-8')
+
+
+def _gzip(body):
+    """Gzip-compress body bytes with the JVM's zlib, returning a Java byte[]"""
+    buf = ByteArrayOutputStream(max(64, len(body) // 4))
+    gz = GZIPOutputStream(buf)
+    gz.write(body)
+    gz.close()
+    return buf.toByteArray()
+
+
+def _entry_to_jsonable(entry, helpers=None):
+    """Build the serializable view of an entry, encoding raw bytes on demand
+    
+    The request text, header lists and response body are only included in
+    the detail view (/history/N), selected by passing Burp's helpers; they
+    are derived here and not kept on the entry.
+    """
+    item = {k: v for k, v in entry.items() if not k.startswith("_")}
+    item["request"] = _ENC.encodeToString(entry["_request_raw"])
+    if helpers is not None:
+        requestInfo = helpers.analyzeRequest(entry["_service"], entry["_request_raw"])
+        responseInfo = helpers.analyzeResponse(entry["_response_raw"])
+        item["request_text"] = helpers.bytesToString(entry["_request_raw"])
+        item["headers"] = [str(h) for h in requestInfo.getHeaders()]
+        item["response_headers"] = [str(h) for h in responseInfo.getHeaders()]
+        item["response"] = _ENC.encodeToString(entry["_response_raw"])
+    return item
+
+
+def _entry_json(entry, helpers=None):
+    """Return the entry as JSON, serializing it only on first use"""
+    key = "_json" if helpers is None else "_detail_json"
+    cached = entry.get(key)
+    if cached is None:
+        cached = _dumps(_entry_to_jsonable(entry, helpers))
+        entry[key] = cached
+    return cached
+
+
+class BurpExtender(IBurpExtender, IProxyListener, IExtensionStateListener):
     
     def registerExtenderCallbacks(self, callbacks):
         self._callbacks = callbacks
@@ -37,13 +114,29 @@ class BurpExtender(IBurpExtender, IProxyListener):
         # Register proxy listener
         callbacks.registerProxyListener(self)
         
+        # Stop the server and worker threads when the extension is unloaded
+        callbacks.registerExtensionStateListener(self)
+        
         # Store for history
-        self._history = []
         self._max_history = 1000
+        self._history = deque(maxlen=self._max_history)
+        self._next_index = 0
+        self._by_index = {}
+        self._host_counts = {}
+        self._method_counts = {}
+        self._lock = threading.RLock()
+        self._stats_cache = None
+        self._stats_dirty = True
         
         # Start HTTP server
         self._port = 8899
         self._running = True
+        self._server = None
+        
+        # Connection handlers run on a fixed pool; keep-alive connections hold a
+        # worker while idle, so don't go below 8 on small machines
+        self._pool_size = max(8, Runtime.getRuntime().availableProcessors())
+        self._pool = Executors.newFixedThreadPool(self._pool_size)
         
         server_thread = Thread(HttpServerRunnable(self))
         server_thread.start()
@@ -60,6 +153,22 @@ class BurpExtender(IBurpExtender, IProxyListener):
         self._stdout.println("    GET  /stats       - Get traffic statistics")
         self._stdout.println("=" * 50)
     
+    def extensionUnloaded(self):
+        """Shut down the HTTP server and its worker pool"""
+        self._running = False
+        self._pool.shutdown()
+        if self._server is not None:
+            try:
+                self._server.close()
+            except:
+                pass
+        self._stdout.println("[+] Burp AI Bridge unloaded")
+    
+    def pool_is_busy(self):
+        """True when every worker is taken or a connection is waiting for one"""
+        return (self._pool.getActiveCount() >= self._pool_size
+                or not self._pool.getQueue().isEmpty())
+    
     def processProxyMessage(self, messageIsRequest, message):
         """Capture proxy messages"""
         if not messageIsRequest:
@@ -72,54 +181,79 @@ class BurpExtender(IBurpExtender, IProxyListener):
             
             if request and response:
                 entry = {
-                    "index": len(self._history),
                     "host": httpService.getHost(),
                     "port": httpService.getPort(),
                     "protocol": httpService.getProtocol(),
-                    "request": base64.b64encode(bytearray(request)).decode('utf-8'),
-                    "response": base64.b64encode(bytearray(response)).decode('utf-8'),
-                    "request_text": self._helpers.bytesToString(request),
+                    "_service": httpService,
+                    "_request_raw": request,
+                    "_response_raw": response,
+                    "has_upload": self._helpers.indexOf(
+                        request, _UPLOAD_MARKER, False, 0, len(request)) >= 0,
                     "response_length": len(response)
                 }
                 
-                # Parse request info
+                # Parse request/response info; header lists are built only for the detail view
                 requestInfo = self._helpers.analyzeRequest(messageInfo)
                 entry["method"] = requestInfo.getMethod()
                 entry["url"] = str(requestInfo.getUrl())
-                entry["headers"] = [str(h) for h in requestInfo.getHeaders()]
-                
-                # Parse response info
-                if response:
-                    responseInfo = self._helpers.analyzeResponse(response)
-                    entry["status_code"] = responseInfo.getStatusCode()
-                    entry["response_headers"] = [str(h) for h in responseInfo.getHeaders()]
+                entry["status_code"] = self._helpers.analyzeResponse(response).getStatusCode()
                 
-                self._history.append(entry)
-                
-                # Limit history size
-                if len(self._history) > self._max_history:
-                    self._history.pop(0)
+                with self._lock:
+                    # Indexes count captures ever made, so they stay stable across eviction
+                    entry["index"] = self._next_index
+                    self._next_index += 1
+                    
+                    # The deque drops the oldest entry itself once full
+                    if len(self._history) == self._max_history:
+                        evicted = self._history[0]
+                        self._count_entry(evicted, -1)
+                        del self._by_index[evicted["index"]]
+                    self._history.append(entry)
+                    self._by_index[entry["index"]] = entry
+                    self._count_entry(entry, 1)
+                    self._stats_dirty = True
+    
+    def _count_entry(self, entry, delta):
+        """Adjust the per-host and per-method counters for an entry"""
+        for counts, key in ((self._host_counts, entry["host"]),
+                            (self._method_counts, entry["method"])):
+            count = counts.get(key, 0) + delta
+            if count > 0:
+                counts[key] = count
+            else:
+                counts.pop(key, None)
     
     def get_history(self):
         """Return all history"""
-        return self._history
+        with self._lock:
+            return list(self._history)
+    
+    def get_history_raw_json(self):
+        """Return all history as JSON array bytes"""
+        return b"[" + b",".join([_entry_json(e) for e in self.get_history()]) + b"]"
     
     def get_history_item(self, index):
         """Return specific history item"""
-        if 0 <= index < len(self._history):
-            return self._history[index]
-        return None
+        return self._by_index.get(index)
     
     def get_stats(self):
         """Return statistics"""
-        return {
-            "version": VERSION,
-            "author": AUTHOR,
-            "total_requests": len(self._history),
-            "hosts": list(set([h["host"] for h in self._history])),
-            "methods": {m: sum(1 for h in self._history if h["method"] == m) 
-                       for m in set([h["method"] for h in self._history])}
-        }
+        with self._lock:
+            return {
+                "version": VERSION,
+                "author": AUTHOR,
+                "total_requests": len(self._history),
+                "hosts": list(self._host_counts),
+                "methods": dict(self._method_counts)
+            }
+    
+    def get_stats_bytes(self):
+        """Return statistics as JSON bytes, re-serialized only after new captures"""
+        with self._lock:
+            if self._stats_dirty:
+                self._stats_cache = _dumps(self.get_stats())
+                self._stats_dirty = False
+            return self._stats_cache
 
 
 class HttpServerRunnable(Runnable):
@@ -131,21 +265,23 @@ class HttpServerRunnable(Runnable):
     def run(self):
         try:
             server = ServerSocket(self._extender._port, 50, InetAddress.getByName("127.0.0.1"))
+            self._extender._server = server
             self._extender._stdout.println("[+] HTTP Server started on port %d" % self._extender._port)
             
             while self._extender._running:
                 try:
                     client = server.accept()
-                    handler = Thread(RequestHandler(self._extender, client))
-                    handler.start()
+                    self._extender._pool.execute(RequestHandler(self._extender, client))
                 except Exception as e:
-                    self._extender._stderr.println("[-] Server error: %s" % str(e))
+                    # accept() fails once extensionUnloaded closes the socket
+                    if self._extender._running:
+                        self._extender._stderr.println("[-] Server error: %s" % str(e))
         except Exception as e:
             self._extender._stderr.println("[-] Failed to start server: %s" % str(e))
 
 
 class RequestHandler(Runnable):
-    """Handle individual HTTP requests"""
+    """Handle HTTP requests on one client connection (keep-alive)"""
     
     def __init__(self, extender, client):
         self._extender = extender
@@ -153,78 +289,96 @@ class RequestHandler(Runnable):
     
     def run(self):
         try:
-            input_stream = self._client.getInputStream()
-            output_stream = self._client.getOutputStream()
+            # Caps each read, so stalled clients and idle keep-alive connections are dropped
+            self._client.setSoTimeout(3000)
+            input_stream = BufferedInputStream(self._client.getInputStream(), 8192)
+            output_stream = BufferedOutputStream(self._client.getOutputStream(), 8192)
             
-            # Read request
-            request_data = []
+            buf = zeros(8192, 'b')
+            data = bytearray()
             while True:
-                b = input_stream.read()
-                if b == -1:
-                    break
-                request_data.append(chr(b))
-                # Check for end of headers
-                if len(request_data) >= 4:
-                    last4 = ''.join(request_data[-4:])
-                    if last4 == '\r\n\r\n':
+                # Read request headers in chunks until the blank line
+                idx = data.find(b'\r\n\r\n')
+                more = True
+                while idx < 0 and len(data) <= _MAX_REQUEST_BYTES:
+                    # Only rescan the new bytes plus a possible split terminator
+                    start = max(0, len(data) - 3)
+                    more = self._read_more(input_stream, buf, data)
+                    if not more:
                         break
-            
-            request = ''.join(request_data)
-            
-            # Parse request line
-            lines = request.split('\r\n')
-            if lines:
+                    idx = data.find(b'\r\n\r\n', start)
+                
+                if idx > _MAX_REQUEST_BYTES or (idx < 0 and len(data) > _MAX_REQUEST_BYTES):
+                    self._send(output_stream, "413 Payload Too Large",
+                               _dumps({"error": "Request headers too large"}), False)
+                    break
+                if idx < 0:
+                    # Client closed or went idle; never route a truncated header block
+                    if data and more is None:
+                        self._send(output_stream, "408 Request Timeout",
+                                   _dumps({"error": "Request timed out"}), False)
+                    break
+                request = bytes(data[:idx])
+                del data[:idx + 4]
+                
+                # Parse request line
+                lines = request.split('\r\n')
                 parts = lines[0].split(' ')
-                if len(parts) >= 2:
-                    method = parts[0]
-                    path = parts[1]
-                    
-                    # Route request
-                    response_body = ""
-                    status = "200 OK"
-                    
-                    # Add CORS headers
-                    cors_headers = "Access-Control-Allow-Origin: *\r\nAccess-Control-Allow-Methods: GET, POST, OPTIONS\r\nAccess-Control-Allow-Headers: Content-Type\r\n"
-                    
-                    if method == "OPTIONS":
-                        response_body = ""
-                    elif path == "/health":
-                        response_body = json.dumps({
-                            "status": "ok", 
-                            "extension": "Burp AI Bridge",
-                            "version": VERSION,
-                            "author": AUTHOR
-                        })
-                    elif path == "/history":
-                        response_body = json.dumps(self._extender.get_history(), indent=2)
-                    elif path.startswith("/history/"):
-                        try:
-                            index = int(path.split("/")[-1])
-                            item = self._extender.get_history_item(index)
-                            if item:
-                                response_body = json.dumps(item, indent=2)
-                            else:
-                                status = "404 Not Found"
-                                response_body = json.dumps({"error": "Item not found"})
-                        except:
-                            status = "400 Bad Request"
-                            response_body = json.dumps({"error": "Invalid index"})
-                    elif path == "/stats":
-                        response_body = json.dumps(self._extender.get_stats(), indent=2)
-                    else:
-                        status = "404 Not Found"
-                        response_body = json.dumps({
-                            "error": "Endpoint not found", 
-                            "available": ["/health", "/history", "/history/N", "/stats"]
-                        })
-                    
-                    # Send response
-                    response = "HTTP/1.1 %s\r\n%sContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s" % (
-                        status, cors_headers, len(response_body), response_body
-                    )
-                    
-                    output_stream.write(bytearray(response.encode('utf-8')))
-                    output_stream.flush()
+                if len(parts) < 2:
+                    break
+                method = parts[0]
+                path = parts[1]
+                version = parts[2] if len(parts) >= 3 else "HTTP/1.0"
+                
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                
+                # Discard any request body so the next request starts clean
+                try:
+                    body_length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    body_length = -1
+                if body_length < 0:
+                    self._send(output_stream, "400 Bad Request",
+                               _dumps({"error": "Invalid Content-Length"}), False)
+                    break
+                if body_length > _MAX_REQUEST_BYTES:
+                    self._send(output_stream, "413 Payload Too Large",
+                               _dumps({"error": "Request body too large"}), False)
+                    break
+                more = True
+                while len(data) < body_length:
+                    more = self._read_more(input_stream, buf, data)
+                    if not more:
+                        break
+                if len(data) < body_length:
+                    # The rest of the body would be read as the next request
+                    if more is None:
+                        self._send(output_stream, "408 Request Timeout",
+                                   _dumps({"error": "Request timed out"}), False)
+                    break
+                del data[:body_length]
+                
+                gzip_ok = "gzip" in headers.get("accept-encoding", "").lower()
+                connection = headers.get("connection", "").lower()
+                keep_alive = "close" not in connection and (
+                    version == "HTTP/1.1" or "keep-alive" in connection)
+                # Give the worker back when others need it, so idle keep-alive
+                # clients can't starve new connections
+                if keep_alive and self._extender.pool_is_busy():
+                    keep_alive = False
+                # A chunked body has no Content-Length framing to skip past
+                if "transfer-encoding" in headers:
+                    keep_alive = False
+                
+                status, response_body = self._route(method, path)
+                self._send(output_stream, status, response_body, keep_alive, gzip_ok)
+                
+                if not keep_alive:
+                    break
             
             self._client.close()
         except Exception as e:
@@ -233,3 +387,64 @@ class RequestHandler(Runnable):
                 self._client.close()
             except:
                 pass
+    
+    def _send(self, output_stream, status, response_body, keep_alive, gzip_ok=False):
+        """Write one response; header and body go out as separate writes
+        
+        Bodies of _GZIP_MIN_BYTES or more are gzipped when the client accepts
+        it. They are compressed up front so Content-Length still frames the
+        response on keep-alive connections.
+        """
+        extra_headers = ""
+        if gzip_ok and len(response_body) >= _GZIP_MIN_BYTES:
+            response_body = _gzip(response_body)
+            extra_headers = "Content-Encoding: gzip\r\nVary: Accept-Encoding\r\n"
+        header = _RESPONSE_HEADER % (
+            status, extra_headers, len(response_body), "keep-alive" if keep_alive else "close")
+        output_stream.write(header)
+        if response_body:
+            output_stream.write(response_body)
+        output_stream.flush()
+    
+    def _read_more(self, input_stream, buf, data):
+        """Append the next chunk from the socket to data
+        
+        Returns True if bytes were read, False on EOF and None on a read timeout.
+        """
+        try:
+            n = input_stream.read(buf, 0, len(buf))
+        except SocketTimeoutException:
+            return None
+        if n <= 0:
+            return False
+        data.extend(buf[:n].tostring())
+        return True
+    
+    def _route(self, method, path):
+        """Return (status, response_body) for a request"""
+        if method == "OPTIONS":
+            return "200 OK", b""
+        elif path == "/health":
+            return "200 OK", _dumps({
+                "status": "ok", 
+                "extension": "Burp AI Bridge",
+                "version": VERSION,
+                "author": AUTHOR
+            })
+        elif path == "/history":
+            return "200 OK", self._extender.get_history_raw_json()
+        elif path.startswith("/history/"):
+            try:
+                index = int(path.split("/")[-1])
+            except ValueError:
+                return "400 Bad Request", _dumps({"error": "Invalid index"})
+            item = self._extender.get_history_item(index)
+            if item:
+                return "200 OK", _entry_json(item, self._extender._helpers)
+            return "404 Not Found", _dumps({"error": "Item not found"})
+        elif path == "/stats":
+            return "200 OK", self._extender.get_stats_bytes()
+        return "404 Not Found", _dumps({
+            "error": "Endpoint not found", 
+            "available": ["/health", "/history", "/history/N", "/stats"]
+        })
@@ -10,8 +10,68 @@ License: MIT
 import requests
 import base64
 import json
+import re
 from typing import Optional, Dict, Any, List
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+# (field, keywords, type, severity, detail) - a keyword anywhere in the field is a hit;
+# keywords of None means the field is a boolean flag set by the extension
+_VULN_RULES = [
+    ("url", ["url=", "path=", "file=", "src=", "img=", "load=", "uri=", "target="],
+     "Potential SSRF", "HIGH",
+     "URL contains parameter that may accept user-controlled URLs"),
+    ("url", ["id=", "user=", "name=", "order=", "sort=", "query=", "search="],
+     "Potential SQL Injection", "HIGH",
+     "URL contains parameter that may be injectable"),
+    ("url", ["password", "token", "api_key", "secret", "auth", "key"],
+     "Sensitive Data in URL", "MEDIUM",
+     "Sensitive parameter found in URL - may be logged"),
+    ("has_upload", None,
+     "File Upload Detected", "INFO",
+     "File upload functionality - check for unrestricted upload"),
+    ("url", ["file=", "path=", "page=", "include=", "template=", "dir="],
+     "Potential Path Traversal", "HIGH",
+     "URL contains file/path parameter - test for LFI/RFI"),
+]
+
+# One alternation per keyword rule, compiled once. Matched against the
+# lowercased field: that is much faster than re.I on an alternation
+_COMPILED_RULES = [
+    (field,
+     re.compile("|".join(re.escape(k) for k in keywords)) if keywords else None,
+     vtype, severity, detail)
+    for field, keywords, vtype, severity, detail in _VULN_RULES
+]
+
+
+def _build_url_automaton():
+    """Build one Aho-Corasick automaton over the keywords of every URL rule"""
+    keyword_rules = {}
+    for i, (field, keywords, _, _, _) in enumerate(_VULN_RULES):
+        if field == "url":
+            for keyword in keywords:
+                keyword_rules.setdefault(keyword, set()).add(i)
+    automaton = ahocorasick.Automaton()
+    for keyword, rule_ids in keyword_rules.items():
+        automaton.add_word(keyword, frozenset(rule_ids))
+    automaton.make_automaton()
+    return automaton
+
+
+_URL_AUTOMATON = _build_url_automaton() if ahocorasick else None
+
+
 class BurpBridge:
     """Client for Burp AI Bridge API"""
     
@@ -24,26 +84,29 @@ class BurpBridge:
             port: API port (default: 8899)
         """
         self.base_url = f"http://{host}:{port}"
+        # Reuse one keep-alive connection across API calls
+        self._s = requests.Session()
+        self._s.headers['Accept-Encoding'] = 'gzip'
     
     def health(self) -> Dict[str, Any]:
         """Check if Burp AI Bridge is running"""
-        r = requests.get(f"{self.base_url}/health")
-        return r.json()
+        r = self._s.get(f"{self.base_url}/health")
+        return _loads(r.content)
     
     def get_history(self) -> List[Dict]:
         """Get all proxy history"""
-        r = requests.get(f"{self.base_url}/history")
-        return r.json()
+        r = self._s.get(f"{self.base_url}/history")
+        return _loads(r.content)
     
     def get_history_item(self, index: int) -> Dict:
         """Get specific history item by index"""
-        r = requests.get(f"{self.base_url}/history/{index}")
-        return r.json()
+        r = self._s.get(f"{self.base_url}/history/{index}")
+        return _loads(r.content)
     
     def get_stats(self) -> Dict:
         """Get traffic statistics"""
-        r = requests.get(f"{self.base_url}/stats")
-        return r.json()
+        r = self._s.get(f"{self.base_url}/stats")
+        return _loads(r.content)
     
     def analyze_for_vulns(self, history: List[Dict]) -> List[Dict]:
         """
@@ -60,61 +123,31 @@ class BurpBridge:
         for item in history:
             url = item.get("url", "")
             method = item.get("method", "")
-            request_text = item.get("request_text", "")
-            
-            # Check for SSRF indicators
-            ssrf_params = ["url=", "path=", "file=", "src=", "img=", "load=", "uri=", "target="]
-            if any(p in url.lower() for p in ssrf_params):
-                findings.append({
-                    "type": "Potential SSRF",
-                    "severity": "HIGH",
-                    "url": url,
-                    "method": method,
-                    "detail": "URL contains parameter that may accept user-controlled URLs"
-                })
-            
-            # Check for SQL injection indicators
-            sqli_params = ["id=", "user=", "name=", "order=", "sort=", "query=", "search="]
-            if any(p in url.lower() for p in sqli_params):
-                findings.append({
-                    "type": "Potential SQL Injection",
-                    "severity": "HIGH", 
-                    "url": url,
-                    "method": method,
-                    "detail": "URL contains parameter that may be injectable"
-                })
-            
-            # Check for sensitive data exposure
-            sensitive_params = ["password", "token", "api_key", "secret", "auth", "key"]
-            if any(p in url.lower() for p in sensitive_params):
-                findings.append({
-                    "type": "Sensitive Data in URL",
-                    "severity": "MEDIUM",
-                    "url": url,
-                    "method": method,
-                    "detail": "Sensitive parameter found in URL - may be logged"
-                })
+            url_low = url.lower()
             
-            # Check for file upload
-            if "multipart/form-data" in request_text.lower():
-                findings.append({
-                    "type": "File Upload Detected",
-                    "severity": "INFO",
-                    "url": url,
-                    "method": method,
-                    "detail": "File upload functionality - check for unrestricted upload"
-                })
+            # Single pass over the URL for all URL rules when pyahocorasick is present
+            url_hits = None
+            if _URL_AUTOMATON is not None:
+                url_hits = set()
+                for _, rule_ids in _URL_AUTOMATON.iter(url_low):
+                    url_hits.update(rule_ids)
             
-            # Check for path traversal indicators
-            path_params = ["file=", "path=", "page=", "include=", "template=", "dir="]
-            if any(p in url.lower() for p in path_params):
-                findings.append({
-                    "type": "Potential Path Traversal",
-                    "severity": "HIGH",
-                    "url": url,
-                    "method": method,
-                    "detail": "URL contains file/path parameter - test for LFI/RFI"
-                })
+            for i, (field, pattern, vtype, severity, detail) in enumerate(_COMPILED_RULES):
+                if pattern is None:
+                    hit = bool(item.get(field))
+                elif field == "url" and url_hits is not None:
+                    hit = i in url_hits
+                else:
+                    text = url_low if field == "url" else item.get(field, "").lower()
+                    hit = pattern.search(text) is not None
+                if hit:
+                    findings.append({
+                        "type": vtype,
+                        "severity": severity,
+                        "url": url,
+                        "method": method,
+                        "detail": detail
+                    })
         
         return findings
 